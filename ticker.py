@@ -1,46 +1,105 @@
-import requests
+import aiohttp
+import asyncio
+import numpy as np
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import customtkinter as ctk
-from PIL import Image
+from PIL import Image, ImageDraw, ImageFont
 import logging
-from ratelimit import limits, sleep_and_retry
-from datetime import datetime
+from aiolimiter import AsyncLimiter
 import os
-import io
-import matplotlib
-import matplotlib.pyplot as plt
-import json
+import time
+import orjson
+import pickle
+from functools import lru_cache
+from urllib.parse import quote
 
-os.chdir(os.path.dirname(os.path.abspath(__file__)))
 os.environ['DISPLAY'] = ':0'
 
-matplotlib.use('Agg')
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 CALLS = 1200
 RATE_LIMIT = 60
+KLINE_INTERVAL = '1m'
+KLINE_INTERVAL_MS = 60 * 1000
+KLINE_LIMIT = 20
+CHART_SIZE = (550, 275)
+CACHE_INTERVAL = 60
+RECONNECT_DELAY = 5
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+ASSETS_DIR = os.path.join(BASE_DIR, 'assets')
+CACHE_FILE = os.path.join(BASE_DIR, 'cache.pkl')
 
 
 class API:
-    def __init__(self, name, base_url, price_endpoint, change_endpoint, kline_endpoint):
+    def __init__(self, name, base_url, change_endpoint, kline_endpoint, stream_url):
         self.name = name
         self.base_url = base_url
-        self.price_endpoint = price_endpoint
         self.change_endpoint = change_endpoint
         self.kline_endpoint = kline_endpoint
-
-    def get_price_url(self, coin_id):
-        return f"{self.base_url}{self.price_endpoint}?symbol={coin_id}"
+        self.stream_url = stream_url
 
     def get_change_url(self, coin_id):
         return f"{self.base_url}{self.change_endpoint}?symbol={coin_id}"
 
+    def get_batch_change_url(self, coin_ids):
+        symbols = quote(orjson.dumps(coin_ids))
+        return f"{self.base_url}{self.change_endpoint}?symbols={symbols}"
+
     def get_kline_url(self, coin_id, interval, limit):
         return f"{self.base_url}{self.kline_endpoint}?symbol={coin_id}&interval={interval}&limit={limit}"
 
+    def get_stream_url(self, coin_ids, interval):
+        streams = '/'.join(f"{coin_id.lower()}@ticker/{coin_id.lower()}@kline_{interval}" for coin_id in coin_ids)
+        return f"{self.stream_url}?streams={streams}"
+
+
+class HTTPClient:
+    def __init__(self, max_concurrency=4, retries=2, backoff_factor=0.2):
+        connector = aiohttp.TCPConnector(limit_per_host=16, ttl_dns_cache=300)
+        self.session = aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=10))
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.limiter = AsyncLimiter(CALLS, RATE_LIMIT)
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+
+    async def get_json(self, url):
+        for attempt in range(self.retries + 1):
+            try:
+                async with self.limiter, self.semaphore:
+                    async with self.session.get(url) as response:
+                        response.raise_for_status()
+                        return orjson.loads(await response.read())
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                if attempt == self.retries:
+                    raise
+                await asyncio.sleep(self.backoff_factor * 2 ** attempt)
+
+
+@lru_cache(maxsize=None)
+def load_chart_font(size):
+    try:
+        return ImageFont.truetype("DejaVuSans.ttf", size)
+    except OSError:
+        return ImageFont.load_default(size)
+
+
+def downsample_ohlc(data, buckets):
+    open_times, opens, highs, lows, closes = data
+    starts = np.linspace(0, len(opens), buckets + 1).astype(int)[:-1]
+    ends = np.append(starts[1:], len(opens))
+    return np.stack((
+        open_times[starts],
+        opens[starts],
+        np.maximum.reduceat(highs, starts),
+        np.minimum.reduceat(lows, starts),
+        closes[ends - 1],
+    ))
+
 
 APIs = [
     API("Binance", "https://api.binance.com/api/v3/",
-        "ticker/price", "ticker/24hr", "klines"),
+        "ticker/24hr", "klines", "wss://stream.binance.com:9443/stream"),
 ]
 
 
@@ -52,136 +111,154 @@ class Ticker:
         self.price_change = 0
         self.change_24h = 0
         self.last_update = None
-        self.logo_path = f"./assets/{symbol.lower()}.png"
+        self.logo_path = os.path.join(ASSETS_DIR, f"{symbol.lower()}.png")
         self.current_api = APIs[0]
+        self.kline_url = self.current_api.get_kline_url(binance_symbol, KLINE_INTERVAL, KLINE_LIMIT)
         self.candlestick_image = None
+        self.chart_size = CHART_SIZE
+        self.logo_image = None
+        self.klines = np.empty((5, 0))
+        self.last_open_time = None
+        self.last_chart_sig = None
+        self.chart_generation = 0
+        self.chart_lock = threading.Lock()
+        self.dirty = False
         self.appearance_mode = 'Dark'
         self.font_scale = 1.0
-
-    @sleep_and_retry
-    @limits(calls=CALLS, period=RATE_LIMIT)
-    def update(self):
-        try:
-            price_url = self.current_api.get_price_url(self.binance_symbol)
-            price_response = requests.get(price_url, timeout=10)
-            price_response.raise_for_status()
-            price_data = price_response.json()
-            self.price = float(price_data['price'])
-
-            change_url = self.current_api.get_change_url(self.binance_symbol)
-            change_response = requests.get(change_url, timeout=10)
-            change_response.raise_for_status()
-            change_data = change_response.json()
-            self.change_24h = float(change_data['priceChangePercent'])
-            self.price_change = float(change_data['priceChange'])
-
-            self.last_update = datetime.now()
-            self.save_to_cache()
-
-            self.fetch_candlestick_data()
-        except requests.RequestException as e:
-            logging.warning(f"Network error updating {self.symbol}: {e}")
-            self.load_from_cache()
-        except Exception as e:
-            logging.error(f"Unexpected error updating {self.symbol}: {e}")
-            self.load_from_cache()
-
-    def fetch_candlestick_data(self):
+        self.executor = None
+
+    def apply_24hr(self, change_data):
+        self.set_quote(float(change_data['lastPrice']),
+                       float(change_data['priceChangePercent']),
+                       float(change_data['priceChange']))
+
+    def apply_ticker_event(self, event):
+        self.set_quote(float(event['c']), float(event['P']), float(event['p']))
+
+    def set_quote(self, price, change_24h, price_change):
+        now = time.time()
+        changed = (price, change_24h, price_change) != (self.price, self.change_24h, self.price_change)
+        # The "Last updated" label shows whole seconds, so redraw when that would change too
+        stale_label = self.last_update is None or int(now) != int(self.last_update)
+
+        self.price = price
+        self.change_24h = change_24h
+        self.price_change = price_change
+        self.last_update = now
+        if changed or stale_label:
+            self.dirty = True
+
+    def apply_kline_event(self, kline):
+        bar = np.array([kline['t'], kline['o'], kline['h'], kline['l'], kline['c']], dtype=np.float64).reshape(5, 1)
+        self.merge_klines(bar)
+        self.refresh_chart()
+
+    async def fetch_candlestick_data(self, http):
         try:
-            kline_url = self.current_api.get_kline_url(self.binance_symbol, '1m', 20)
-            kline_response = requests.get(kline_url, timeout=10)
-            kline_response.raise_for_status()
-            kline_data = kline_response.json()
-
-            data = []
-            for k in kline_data:
-                timestamp = datetime.fromtimestamp(k[0]/1000)
-                open_price = float(k[1])
-                high_price = float(k[2])
-                low_price = float(k[3])
-                close_price = float(k[4])
-                data.append([timestamp, open_price, high_price, low_price, close_price])
-
-            self.plot_candlestick_chart(data)
+            kline_url = self.kline_url
+            incremental = self.last_open_time is not None and time.time() * 1000 - self.last_open_time < KLINE_LIMIT * KLINE_INTERVAL_MS
+            if incremental:
+                kline_url = f"{kline_url}&startTime={self.last_open_time}"
+            kline_data = await http.get_json(kline_url)
+
+            bars = np.ascontiguousarray(np.array([k[:5] for k in kline_data], dtype=np.float64).reshape(-1, 5).T)
+            self.merge_klines(bars, replace=not incremental)
+            self.refresh_chart()
         except Exception as e:
             logging.error(f"Error fetching candlestick data for {self.symbol}: {e}")
 
-    def plot_candlestick_chart(self, data):
+    def merge_klines(self, bars, replace=False):
+        if replace:
+            self.klines = bars[:, -KLINE_LIMIT:]
+        elif bars.shape[1]:
+            kept = self.klines[:, self.klines[0] < bars[0, 0]]
+            self.klines = np.concatenate((kept, bars), axis=1)[:, -KLINE_LIMIT:]
+        self.last_open_time = int(self.klines[0, -1]) if self.klines.shape[1] else None
+
+    def refresh_chart(self):
+        if not self.klines.shape[1]:
+            return
+        chart_sig = (self.klines[0, 0], tuple(self.klines[:, -1]), self.appearance_mode, self.font_scale)
+        if chart_sig == self.last_chart_sig:
+            return
+        self.last_chart_sig = chart_sig
+        with self.chart_lock:
+            self.chart_generation += 1
+            generation = self.chart_generation
+        self.executor.submit(self.plot_candlestick_chart, self.klines, generation)
+
+    def plot_candlestick_chart(self, data, generation):
         try:
-            fig_width = 7
-            fig_height = 3.5
+            width, height = self.chart_size
+            if data.shape[1] > width:
+                data = downsample_ohlc(data, width)
+            _, opens, highs, lows, closes = data
 
             if self.appearance_mode == 'Dark':
                 text_color = 'white'
             else:
                 text_color = 'black'
 
-            fig_height *= 1.2
-
-            fig, ax = plt.subplots(figsize=(fig_width, fig_height), dpi=100)
-            fig.patch.set_alpha(0.0)
-            ax.set_facecolor('none')
-
             red_color = '#b22222'
             green_color = '#008000'
 
-            high_values = [val[2] for val in data]
-            low_values = [val[3] for val in data]
-            highest_high = max(high_values)
-            lowest_low = min(low_values)
-            idx_highest = high_values.index(highest_high)
-            idx_lowest = low_values.index(lowest_low)
-
-            for idx, val in enumerate(data):
-                color = green_color if val[4] >= val[1] else red_color
-                ax.plot([idx, idx], [val[2], val[3]], color=color, linewidth=1)
-                rect = plt.Rectangle((idx - 0.4, min(val[1], val[4])),
-                                     0.8, abs(val[4] - val[1]),
-                                     color=color)
-                ax.add_patch(rect)
-
-            fontsize = int(12 * self.font_scale)
-
-            ax.text(idx_highest, highest_high, f'{highest_high:.2f}', color=text_color, fontsize=fontsize,
-                    verticalalignment='bottom', horizontalalignment='center')
-
-            ax.text(idx_lowest, lowest_low, f'{lowest_low:.2f}', color=text_color, fontsize=fontsize,
-                    verticalalignment='top', horizontalalignment='center')
-
-            ax.axis('off')
-            buf = io.BytesIO()
-            plt.savefig(buf, format='png', bbox_inches='tight', pad_inches=0, transparent=True)
-            buf.seek(0)
-            self.candlestick_image = Image.open(buf)
-            plt.close(fig)
+            idx_highest = int(highs.argmax())
+            idx_lowest = int(lows.argmin())
+            highest_high = highs[idx_highest]
+            lowest_low = lows[idx_lowest]
+
+            fontsize = int(16 * self.font_scale)
+            font = load_chart_font(fontsize)
+            margin = fontsize + 4
+            y_scale = (height - 2 * margin) / ((highest_high - lowest_low) or 1)
+            bar_width = width / len(opens)
+
+            def to_y(price):
+                return margin + (highest_high - price) * y_scale
+
+            image = Image.new('RGBA', self.chart_size, (0, 0, 0, 0))
+            draw = ImageDraw.Draw(image)
+
+            centers = (np.arange(len(opens)) + 0.5) * bar_width
+            wicks = np.column_stack((centers, to_y(highs), centers, to_y(lows)))
+            bodies = np.column_stack((centers - 0.4 * bar_width, to_y(np.maximum(opens, closes)),
+                                      centers + 0.4 * bar_width, to_y(np.minimum(opens, closes))))
+            rising = closes >= opens
+
+            for color, group in ((green_color, rising), (red_color, ~rising)):
+                for wick, body in zip(wicks[group].tolist(), bodies[group].tolist()):
+                    draw.line(wick, fill=color, width=1)
+                    draw.rectangle(body, fill=color)
+
+            for idx, value, anchor in ((idx_highest, highest_high, 'mb'), (idx_lowest, lowest_low, 'mt')):
+                text = f'{value:.2f}'
+                half_width = draw.textlength(text, font=font) / 2
+                x = min(max((idx + 0.5) * bar_width, half_width), width - half_width)
+                draw.text((x, to_y(value)), text, fill=text_color, font=font, anchor=anchor)
+
+            with self.chart_lock:
+                if generation == self.chart_generation:
+                    self.candlestick_image = image
+                    self.dirty = True
         except Exception as e:
             logging.error(f"Error plotting candlestick chart for {self.symbol}: {e}")
 
-    def save_to_cache(self):
-        cache_data = {
+    def get_cache_data(self):
+        return {
             'price': self.price,
             'price_change': self.price_change,
             'change_24h': self.change_24h,
-            'last_update': self.last_update.isoformat(),
+            'last_update': self.last_update,
             'api': self.current_api.name
         }
-        with open(f"{self.symbol}_cache.json", 'w') as f:
-            json.dump(cache_data, f)
 
-    def load_from_cache(self):
-        try:
-            with open(f"{self.symbol}_cache.json", 'r') as f:
-                cache_data = json.load(f)
-            self.price = cache_data['price']
-            self.price_change = cache_data.get('price_change', 0)
-            self.change_24h = cache_data['change_24h']
-            self.last_update = datetime.fromisoformat(cache_data['last_update'])
-            self.current_api = next(api for api in APIs if api.name == cache_data['api'])
-            logging.info(f"Loaded cached data for {self.symbol}")
-        except FileNotFoundError:
-            logging.warning(f"No cache file found for {self.symbol}")
-        except json.JSONDecodeError:
-            logging.error(f"Error decoding cache file for {self.symbol}")
+    def apply_cache_data(self, cache_data):
+        self.price = cache_data['price']
+        self.price_change = cache_data.get('price_change', 0)
+        self.change_24h = cache_data['change_24h']
+        self.last_update = cache_data['last_update']
+        self.current_api = next(api for api in APIs if api.name == cache_data['api'])
+        self.dirty = True
 
 
 class GUI(ctk.CTk):
@@ -199,6 +276,7 @@ class GUI(ctk.CTk):
         font_scale = min(width_scale, height_scale)
         if screen_height <= 600:
             font_scale *= 0.8
+        self.large_layout = screen_width >= 1920 and screen_height >= 1080
 
         self.appearance_mode = "Dark"
         ctk.set_appearance_mode(self.appearance_mode.lower())
@@ -207,8 +285,8 @@ class GUI(ctk.CTk):
         self.main_frame = ctk.CTkFrame(self, corner_radius=0)
         self.main_frame.pack(fill="both", expand=True)
 
-        self.sun_icon = ctk.CTkImage(Image.open('./assets/sun.png'), size=(int(24 * font_scale), int(24 * font_scale)))
-        self.moon_icon = ctk.CTkImage(Image.open('./assets/moon.png'), size=(int(24 * font_scale), int(24 * font_scale)))
+        self.sun_icon = ctk.CTkImage(Image.open(os.path.join(ASSETS_DIR, 'sun.png')), size=(int(24 * font_scale), int(24 * font_scale)))
+        self.moon_icon = ctk.CTkImage(Image.open(os.path.join(ASSETS_DIR, 'moon.png')), size=(int(24 * font_scale), int(24 * font_scale)))
 
         if self.appearance_mode == "Dark":
             initial_icon = self.sun_icon
@@ -236,33 +314,51 @@ class GUI(ctk.CTk):
 
         self.frames = []
 
-        if screen_width >= 1920 and screen_height >= 1080:
+        self.loop = asyncio.new_event_loop()
+        threading.Thread(target=self.loop.run_forever, daemon=True).start()
+        self.http = None
+        self.pool = ThreadPoolExecutor(max_workers=4)
+        self.tickers_by_symbol = {ticker.binance_symbol: ticker for ticker in self.tickers}
+        self.batch_change_url = APIs[0].get_batch_change_url(list(self.tickers_by_symbol))
+        self.stream_url = APIs[0].get_stream_url(list(self.tickers_by_symbol), KLINE_INTERVAL)
+        self.last_cache_write = 0
+
+        if self.large_layout:
+            self.fonts = {
+                'name': ctk.CTkFont(family="Helvetica", size=int(24 * font_scale), weight="bold"),
+                'price': ctk.CTkFont(family="Helvetica", size=int(36 * font_scale), weight="bold"),
+                'change': ctk.CTkFont(family="Helvetica", size=int(24 * font_scale)),
+                'updated': ctk.CTkFont(family="Helvetica", size=int(12 * font_scale)),
+            }
+        else:
+            self.fonts = {
+                'name': ctk.CTkFont(family="Helvetica", size=int(90 * font_scale), weight="bold"),
+                'price': ctk.CTkFont(family="Helvetica", size=int(90 * font_scale), weight="bold"),
+                'change': ctk.CTkFont(family="Helvetica", size=int(56 * font_scale)),
+            }
+
+        if self.large_layout:
             for i, ticker in enumerate(self.tickers):
                 frame = ctk.CTkFrame(self.main_frame, corner_radius=20)
                 frame.grid(row=i // 2, column=i % 2, padx=int(15 * width_scale), pady=int(15 * height_scale), sticky="nsew")
                 frame.grid_rowconfigure((0, 1, 2, 3, 4, 5), weight=1)
                 frame.grid_columnconfigure(0, weight=1)
 
-                name_font = ctk.CTkFont(family="Helvetica", size=int(24 * font_scale), weight="bold")
-                price_font = ctk.CTkFont(family="Helvetica", size=int(36 * font_scale), weight="bold")
-                change_font = ctk.CTkFont(family="Helvetica", size=int(24 * font_scale))
-                updated_font = ctk.CTkFont(family="Helvetica", size=int(12 * font_scale))
-
                 logo_label = ctk.CTkLabel(frame, text="")
                 logo_label.grid(row=0, column=0, pady=(int(5 * height_scale), int(2 * height_scale)))
 
                 name_label = ctk.CTkLabel(frame, text=ticker.symbol,
-                                          font=name_font,
+                                          font=self.fonts['name'],
                                           anchor='center')
                 name_label.grid(row=1, column=0, pady=int(2 * height_scale))
 
                 price_label = ctk.CTkLabel(frame, text="",
-                                           font=price_font,
+                                           font=self.fonts['price'],
                                            anchor='center')
                 price_label.grid(row=2, column=0, pady=int(2 * height_scale))
 
                 change_label = ctk.CTkLabel(frame, text="",
-                                            font=change_font,
+                                            font=self.fonts['change'],
                                             anchor='center')
                 change_label.grid(row=3, column=0, pady=int(2 * height_scale))
 
@@ -270,7 +366,7 @@ class GUI(ctk.CTk):
                 chart_label.grid(row=4, column=0, pady=(int(2 * height_scale), int(5 * height_scale)))
 
                 updated_label = ctk.CTkLabel(frame, text="",
-                                             font=updated_font,
+                                             font=self.fonts['updated'],
                                              anchor='center')
                 updated_label.grid(row=5, column=0, pady=(0, int(5 * height_scale)))
 
@@ -282,10 +378,6 @@ class GUI(ctk.CTk):
                 frame.grid_rowconfigure((0, 1, 2), weight=1)
                 frame.grid_columnconfigure(0, weight=1)
 
-                name_font = ctk.CTkFont(family="Helvetica", size=int(40 * font_scale), weight="bold")
-                price_font = ctk.CTkFont(family="Helvetica", size=int(40 * font_scale), weight="bold")
-                change_font = ctk.CTkFont(family="Helvetica", size=int(44 * font_scale))
-
                 header_frame = ctk.CTkFrame(frame, fg_color="transparent")
                 header_frame.grid(row=0, column=0, pady=(int(2 * height_scale), int(0 * height_scale)))
 
@@ -293,17 +385,17 @@ class GUI(ctk.CTk):
                 logo_label.pack(side="left", padx=int(30 * width_scale))
 
                 name_label = ctk.CTkLabel(header_frame, text=ticker.symbol,
-                                          font=name_font,
+                                          font=self.fonts['name'],
                                           anchor='center')
                 name_label.pack(side="left", padx=int(20 * width_scale), pady=(int(15 * width_scale), 0))
 
                 price_label = ctk.CTkLabel(header_frame, text="",
-                                           font=price_font,
+                                           font=self.fonts['price'],
                                            anchor='center')
                 price_label.pack(side="left", padx=int(20 * width_scale), pady=(int(15 * width_scale), 0))
 
                 change_label = ctk.CTkLabel(frame, text="",
-                                            font=change_font,
+                                            font=self.fonts['change'],
                                             anchor='center')
                 change_label.grid(row=1, column=0, pady=(0, int(1 * height_scale)))
 
@@ -312,12 +404,32 @@ class GUI(ctk.CTk):
 
                 self.frames.append((logo_label, name_label, price_label, change_label, chart_label))
 
-        self.update_prices()
+        if self.large_layout:
+            logo_size = int(64 * font_scale)
+            chart_size = (int(550 * width_scale), int(275 * height_scale))
+        else:
+            logo_size = int(80 * font_scale)
+            chart_size = (int(600 * width_scale), int(275 * height_scale))
+
+        for ticker, frame_elements in zip(self.tickers, self.frames):
+            ticker.font_scale = font_scale
+            ticker.chart_size = chart_size
+            ticker.executor = self.pool
+            if os.path.exists(ticker.logo_path):
+                logo_image = Image.open(ticker.logo_path).resize((logo_size, logo_size), Image.Resampling.LANCZOS)
+                ticker.logo_image = ctk.CTkImage(light_image=logo_image, dark_image=logo_image, size=(logo_size, logo_size))
+                frame_elements[0].configure(image=ticker.logo_image)
+
+        asyncio.run_coroutine_threadsafe(self.stream_prices(), self.loop)
+        self.redraw_dirty_tickers()
 
     def toggle_mode(self):
         self.appearance_mode = "Light" if self.appearance_mode == "Dark" else "Dark"
         ctk.set_appearance_mode(self.appearance_mode.lower())
         self.update_mode_button_icon()
+        for ticker in self.tickers:
+            ticker.appearance_mode = self.appearance_mode
+            self.loop.call_soon_threadsafe(ticker.refresh_chart)
 
     def update_mode_button_icon(self):
         if self.appearance_mode == "Dark":
@@ -327,92 +439,129 @@ class GUI(ctk.CTk):
             self.mode_button.configure(image=self.moon_icon)
             self.mode_button.configure(fg_color="#E0E0E0", hover_color="#D0D0D0")
 
-    @sleep_and_retry
-    @limits(calls=CALLS, period=RATE_LIMIT)
-    def update_prices(self):
+    def redraw_dirty_tickers(self):
         for ticker, frame_elements in zip(self.tickers, self.frames):
-            ticker.appearance_mode = self.appearance_mode
-            ticker.update()
-            self.update_ticker_display(ticker, frame_elements)
-
-        self.after(10000, self.update_prices)
-
-    def update_ticker_display(self, ticker, frame_elements):
+            if ticker.dirty and ticker.last_update is not None:
+                ticker.dirty = False
+                self.update_ticker_display(ticker, frame_elements)
+
+        self.after(1000, self.redraw_dirty_tickers)
+
+    async def stream_prices(self):
+        self.load_cache()
+        while True:
+            try:
+                if self.http is None:
+                    self.http = HTTPClient()
+                await self.update_all()
+                async with self.http.session.ws_connect(self.stream_url, heartbeat=30) as ws:
+                    async for message in ws:
+                        if message.type != aiohttp.WSMsgType.TEXT:
+                            break
+                        self.handle_stream_event(message.data)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                logging.warning(f"Price stream disconnected: {e}")
+            except Exception:
+                logging.exception("Unexpected error in price stream")
+            await asyncio.sleep(RECONNECT_DELAY)
+
+    def handle_stream_event(self, message):
+        try:
+            event = orjson.loads(message)['data']
+            ticker = self.tickers_by_symbol[event['s']]
+            if event['e'] == '24hrTicker':
+                ticker.apply_ticker_event(event)
+                if time.monotonic() - self.last_cache_write >= CACHE_INTERVAL:
+                    self.save_cache()
+            elif event['e'] == 'kline':
+                ticker.apply_kline_event(event['k'])
+        except (KeyError, TypeError, ValueError) as e:
+            logging.error(f"Error handling stream event: {e}")
+
+    async def update_all(self):
+        await self.fetch_all_24hr()
+        await asyncio.gather(*[ticker.fetch_candlestick_data(self.http) for ticker in self.tickers])
+
+    async def fetch_all_24hr(self):
+        try:
+            change_data = await self.http.get_json(self.batch_change_url)
+            for entry in change_data:
+                self.tickers_by_symbol[entry['symbol']].apply_24hr(entry)
+            self.save_cache()
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logging.warning(f"Network error updating prices: {e}")
+            self.load_cache()
+        except Exception as e:
+            logging.error(f"Unexpected error updating prices: {e}")
+            self.load_cache()
 
-        screen_width = self.winfo_screenwidth()
-        screen_height = self.winfo_screenheight()
-        width_scale = screen_width / 1920
-        height_scale = screen_height / 1080
-        font_scale = min(width_scale, height_scale)
-        if screen_height <= 600:
-            font_scale *= 0.8
+    def save_cache(self):
+        snapshot = {ticker.symbol: ticker.get_cache_data() for ticker in self.tickers if ticker.last_update is not None}
+        try:
+            with open(CACHE_FILE, 'wb') as f:
+                pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+        except OSError as e:
+            logging.error(f"Error writing cache file: {e}")
+        self.last_cache_write = time.monotonic()
 
-        ticker.font_scale = font_scale
+    def load_cache(self):
+        try:
+            with open(CACHE_FILE, 'rb') as f:
+                snapshot = pickle.load(f)
+            for ticker in self.tickers:
+                cache_data = snapshot.get(ticker.symbol)
+                if cache_data is None:
+                    continue
+                # Never roll live prices back to an older snapshot
+                if ticker.last_update is None or cache_data['last_update'] > ticker.last_update:
+                    ticker.apply_cache_data(cache_data)
+            logging.info("Loaded cached data")
+        except FileNotFoundError:
+            logging.warning("No cache file found")
+        except OSError as e:
+            logging.error(f"Error reading cache file: {e}")
+        except Exception as e:
+            logging.error(f"Error decoding cache file: {e!r}")
 
-        if os.path.exists(ticker.logo_path):
-            logo_image = Image.open(ticker.logo_path)
-            if screen_width >= 1920 and screen_height >= 1080:
-                logo_size = int(64 * font_scale)
-            else:
-                logo_size = int(80 * font_scale)
-            logo_image = logo_image.resize((logo_size, logo_size), Image.Resampling.LANCZOS)
-            logo_photo = ctk.CTkImage(light_image=logo_image, dark_image=logo_image, size=(logo_size, logo_size))
-            logo_label = frame_elements[0]
-            logo_label.configure(image=logo_photo)
-            logo_label.image = logo_photo
-
-        if screen_width >= 1920 and screen_height >= 1080:
+    def update_ticker_display(self, ticker, frame_elements):
+        if self.large_layout:
             logo_label, name_label, price_label, change_label, chart_label, updated_label = frame_elements
-
-            name_font = ctk.CTkFont(family="Helvetica", size=int(24 * font_scale), weight="bold")
-            price_font = ctk.CTkFont(family="Helvetica", size=int(36 * font_scale), weight="bold")
-            change_font = ctk.CTkFont(family="Helvetica", size=int(24 * font_scale))
-            updated_font = ctk.CTkFont(family="Helvetica", size=int(12 * font_scale))
-
-            name_label.configure(font=name_font)
-            price_label.configure(font=price_font)
-            change_label.configure(font=change_font)
-            updated_label.configure(font=updated_font)
         else:
             logo_label, name_label, price_label, change_label, chart_label = frame_elements
 
-            name_font = ctk.CTkFont(family="Helvetica", size=int(90 * font_scale), weight="bold")
-            price_font = ctk.CTkFont(family="Helvetica", size=int(90 * font_scale), weight="bold")
-            change_font = ctk.CTkFont(family="Helvetica", size=int(56 * font_scale))
-
-            name_label.configure(font=name_font)
-            price_label.configure(font=price_font)
-            change_label.configure(font=change_font)
-
-        precision = 7 - len(str(int(ticker.price)))
-        precision = max(2, precision)
-        formatted_price = f"${ticker.price:,.{precision}f}"
-        price_label.configure(text=formatted_price)
+        price = ticker.price
+        precision = 6 if price < 10 else 5 if price < 100 else 4 if price < 1000 else 3 if price < 10000 else 2
+        formatted_price = f"${price:,.{precision}f}"
+        self.configure_if_changed(price_label, text=formatted_price)
 
         arrow = "▲" if ticker.change_24h > 0 else "▼"
         color = "#41D128" if ticker.change_24h > 0 else "#EB4034"
         sign = "+" if ticker.price_change > 0 else "-"
         dollar_change = abs(ticker.price_change)
-        change_label.configure(
+        self.configure_if_changed(
+            change_label,
             text=f"{arrow} {abs(ticker.change_24h):.2f}% ({sign}${dollar_change:.2f})",
             text_color=color
         )
 
-        if ticker.candlestick_image:
-            if screen_width >= 1920 and screen_height >= 1080:
-                chart_width = int(550 * width_scale)
-                chart_height = int(275 * height_scale)
-            else:
-                chart_width = int(600 * width_scale)
-                chart_height = int(275 * height_scale)
-            chart_image = ticker.candlestick_image.resize((chart_width, chart_height), Image.Resampling.LANCZOS)
-            chart_photo = ctk.CTkImage(light_image=chart_image, dark_image=chart_image, size=(chart_width, chart_height))
+        chart_image = ticker.candlestick_image
+        if chart_image is not None and chart_image is not getattr(chart_label, 'source_image', None):
+            chart_photo = ctk.CTkImage(light_image=chart_image, dark_image=chart_image, size=ticker.chart_size)
             chart_label.configure(image=chart_photo)
             chart_label.image = chart_photo
-
-        if screen_width >= 1920 and screen_height >= 1080:
-            updated_label.configure(text=f"Last updated: {ticker.last_update.strftime('%H:%M:%S')}",
-                                    text_color="gray")
+            chart_label.source_image = chart_image
+
+        if self.large_layout:
+            self.configure_if_changed(updated_label,
+                                      text=f"Last updated: {time.strftime('%H:%M:%S', time.localtime(ticker.last_update))}",
+                                      text_color="gray")
+
+    def configure_if_changed(self, widget, **kwargs):
+        applied = getattr(widget, 'applied_options', {})
+        changed = {key: value for key, value in kwargs.items() if applied.get(key) != value}
+        if changed:
+            widget.configure(**changed)
+            widget.applied_options = {**applied, **changed}
 
 
 def run_gui():